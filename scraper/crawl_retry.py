@@ -0,0 +1,15 @@
+import random
+
+# Maximum delay in seconds between retry attempts
+MAX_RETRY_DELAY = 8
+
+def is_transient_failure(result):
+    """Return False for client errors (4xx except 429) that will not succeed on retry."""
+    status_code = getattr(result, "status_code", None)
+    if status_code is None:
+        return True
+    return not (400 <= status_code < 500 and status_code != 429)
+
+def backoff_delay(attempt):
+    """Return the exponential backoff delay for a retry attempt, with jitter."""
+    return min(2 ** attempt, MAX_RETRY_DELAY) + random.uniform(0, 0.5)
@@ -5,41 +5,41 @@ from dotenv import load_dotenv
 from crawl4ai import AsyncWebCrawler
 from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
 from gcp.gcp_bucket import download_urls_from_gcs, upload_urls_to_gcs
-from product import extract_product_id, extract_urls_from_markdown
 from gcp.gcp_bucket import upload_image_mapping_to_gcs
 from transformation.hardcoded_re import extract_product_id, extract_urls_from_markdown
+from crawl_retry import backoff_delay, is_transient_failure
 
 # Load environment variables
 load_dotenv()
 
-async def extract_image_url_from_page(url, browser_config, run_config, max_retries=3):
-    """Extract image URL from a single page with retry logic."""
+# Maximum number of pages crawled concurrently
+MAX_CONCURRENT_CRAWLS = 10
+
+async def extract_image_url_from_page(crawler, url, run_config, max_retries=3):
+    """Extract image URL from a single page with retry logic, reusing the given crawler."""
     for attempt in range(max_retries):
         try:
-            async with AsyncWebCrawler(config=browser_config) as crawler:
-                result = await crawler.arun(url=url, config=run_config)
-                
-                if result.success:
-                    print(f"Successfully crawled {url} on attempt {attempt + 1}")
-                    try:
-                        image_url = extract_urls_from_markdown(result.markdown)
-                        
-                        return image_url
-                    except (IndexError, AttributeError):
-                        print(f"Warning: No image URL found in markdown for {url}")
-                        return None
-                else:
-                    print(f"Attempt {attempt + 1} failed for {url}: {result.error_message}")
-                    if attempt == max_retries - 1:
-                        print(f"All attempts failed for {url}")
-                        return None
-                        
+            result = await crawler.arun(url=url, config=run_config)
+            
+            if result.success:
+                print(f"Successfully crawled {url} on attempt {attempt + 1}")
+                image_url = extract_urls_from_markdown(result.markdown)
+                if not image_url:
+                    print(f"Warning: No image URL found in markdown for {url}")
+                return image_url
+            
+            print(f"Attempt {attempt + 1} failed for {url}: {result.error_message}")
+            if not is_transient_failure(result):
+                print(f"Not retrying {url}: status code {result.status_code}")
+                return None
+                    
         except Exception as e:
             print(f"Attempt {attempt + 1} failed for {url}: {str(e)}")
-            if attempt == max_retries - 1:
-                print(f"All attempts failed for {url}")
-                return None
-            await asyncio.sleep(2 ** attempt)
+        
+        if attempt == max_retries - 1:
+            print(f"All attempts failed for {url}")
+            return None
+        await asyncio.sleep(backoff_delay(attempt))
     
     return None
 
@@ -61,28 +61,46 @@ async def create_image_mapping():
     # Dictionary to store article_id -> image_url mapping
     image_mapping = {}
     
-    # Process each URL
-    for i, url in enumerate(garment_urls, 1):
-        print(f"Processing URL {i}/{len(garment_urls)}: {url}")
-        
+    # Limit how many pages are crawled at the same time
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CRAWLS)
+    
+    async def process_url(i, url, crawler):
+        """Crawl a single URL and return its (article_id, image_url) pair."""
         # Extract article ID from URL
         article_id = extract_product_id(url)
         if not article_id:
             print(f"Warning: Could not extract article ID from {url}")
+            return None, None
+        
+        async with semaphore:
+            print(f"Processing URL {i}/{len(garment_urls)}: {url}")
+            # Extract image URL from page content
+            image_url = await extract_image_url_from_page(crawler, url, run_config)
+        
+        return article_id, image_url
+    
+    # Process all URLs concurrently with a single browser instance
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        tasks = [
+            process_url(i, url, crawler)
+            for i, url in enumerate(garment_urls, 1)
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error processing URL: {str(result)}")
             continue
         
-        # Extract image URL from page content
-        image_url = await extract_image_url_from_page(url, browser_config, run_config)
+        article_id, image_url = result
+        if not article_id:
+            continue
         
         if image_url:
             image_mapping[article_id] = image_url
             print(f"Mapped article {article_id} -> {image_url}")
         else:
             print(f"Warning: Could not extract image URL for article {article_id}")
-        
-        # Small delay to be gentle on the server
-        if i < len(garment_urls):
-            await asyncio.sleep(1)
     
     print(f"Created mapping for {len(image_mapping)} articles")
     
@@ -1,49 +1,116 @@
+import gzip
+import io
+import os
+from functools import lru_cache
 from google.cloud import storage
-import json
+from requests.adapters import HTTPAdapter
+import orjson
+
+
+# Size of the keep-alive connection pool shared by all GCS requests
+GCS_POOL_SIZE = 64
+
+
+@lru_cache(maxsize=None)
+def _get_client(project_id):
+    """Return a shared storage client for the given project with a large keep-alive pool."""
+    client = storage.Client(project=project_id)
+    adapter = HTTPAdapter(pool_connections=GCS_POOL_SIZE, pool_maxsize=GCS_POOL_SIZE)
+    client._http.mount("https://", adapter)
+    return client
+
+
+@lru_cache(maxsize=None)
+def _get_bucket(project_id, bucket_name):
+    """Return a shared bucket handle for the given project and bucket name."""
+    return _get_client(project_id).bucket(bucket_name)
+
+
 def upload_urls_to_gcs(urls, bucket_name="web-scrape-ai", destination_blob_name="garments/urls.txt", project_id="voii-459718"):
-    """Upload a list of URLs to a GCP bucket."""
-    storage_client = storage.Client(project=project_id)
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_name)
-    content = "\n".join(urls)
-    blob.upload_from_string(content, content_type="text/plain; charset=utf-8")
-    print(f"Uploaded {len(urls)} URLs to {bucket_name}/{destination_blob_name}")
+    """Upload an iterable of URLs to a GCP bucket, one per line."""
+    blob = _get_bucket(project_id, bucket_name).blob(destination_blob_name)
+    buffer = io.BytesIO()
+    count = 0
+    # URL lists are highly redundant text, so store them gzip-compressed
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6) as gz:
+        for url in urls:
+            if count:
+                gz.write(b"\n")
+            gz.write(url.encode("utf-8"))
+            count += 1
+    blob.content_encoding = "gzip"
+    # Passing the size lets the client use a single-request multipart upload
+    # instead of a chunked resumable one
+    size = buffer.tell()
+    buffer.seek(0)
+    blob.upload_from_file(buffer, size=size, content_type="text/plain; charset=utf-8")
+    print(f"Uploaded {count} URLs to {bucket_name}/{destination_blob_name}")
+
+
+
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Replay bytes already read from a stream before reading the rest of it."""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._prefix[:len(buffer)] or self._stream.read(len(buffer))
+        self._prefix = self._prefix[len(data):]
+        buffer[:len(data)] = data
+        return len(data)
+
 
+def iter_lines_from_gcs(bucket_name, destination_blob_name, project_id):
+    """Stream the lines of a text blob without loading the whole object into memory."""
+    blob = _get_bucket(project_id, bucket_name).blob(destination_blob_name)
+    # Read the stored bytes as-is, so gzip blobs are decompressed locally while streaming
+    with blob.open("rb", raw_download=True) as reader:
+        # The first chunk's download response fills in blob.content_encoding, so
+        # there is no separate metadata request; its bytes are replayed below
+        head = reader.read(2)
+        raw = io.BufferedReader(_PrefixedReader(head, reader))
+        if blob.content_encoding == "gzip":
+            f = gzip.open(raw, "rt", encoding="utf-8")
+        else:
+            f = io.TextIOWrapper(raw, encoding="utf-8")
+        with f:
+            for line in f:
+                yield line.rstrip("\r\n")
 
 
+def iter_urls_from_gcs(bucket_name="web-scrape-ai", destination_blob_name="garments/urls.txt", project_id="voii-459718"):
+    """Stream URLs from a GCP bucket one line at a time."""
+    return iter_lines_from_gcs(bucket_name, destination_blob_name, project_id)
 
 
 def download_urls_from_gcs(bucket_name="web-scrape-ai", destination_blob_name="garments/urls.txt", project_id="voii-459718"):
     """Download URLs from a GCP bucket."""
-    storage_client = storage.Client(project=project_id)
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_name)
-    content = blob.download_as_text()
-    urls = content.splitlines()
+    urls = list(iter_urls_from_gcs(bucket_name, destination_blob_name, project_id))
     print(f"Downloaded {len(urls)} URLs from {bucket_name}/{destination_blob_name}")
     return urls
 
 
 def download_processed_garments_from_gcs(bucket_name="web-scrape-ai", destination_blob_name="garments-info/products-info_test.txt", project_id="voii-459718"):
     """Download processed garment data from a GCP bucket."""
-    storage_client = storage.Client(project=project_id)
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_name)
-    content = blob.download_as_text()
-    garments = content.splitlines()
+    garments = list(iter_lines_from_gcs(bucket_name, destination_blob_name, project_id))
     print(f"Downloaded {len(garments)} processed garment items from {bucket_name}/{destination_blob_name}")
     return garments
 
 def upload_image_mapping_to_gcs(mapping_dict, bucket_name="web-scrape-ai", destination_blob_name="image_mapping1.json", project_id="voii-459718"):
     """Upload image mapping dictionary as JSON to GCP bucket."""
     try:
-        from google.cloud import storage
-        storage_client = storage.Client(project=project_id)
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
+        blob = _get_bucket(project_id, bucket_name).blob(destination_blob_name)
         
-        # Convert dictionary to JSON string
-        mapping_json = json.dumps(mapping_dict, indent=2)
+        # Serialize dictionary to compact JSON bytes (set PRETTY_JSON=1 for indented output)
+        options = orjson.OPT_INDENT_2 if os.getenv("PRETTY_JSON") else 0
+        mapping_json = orjson.dumps(mapping_dict, option=options)
         
         # Upload as JSON content
         blob.upload_from_string(mapping_json, content_type="application/json; charset=utf-8")
@@ -1,10 +1,21 @@
 import os
+import httpx
 from dotenv import load_dotenv
 from groq import Groq
 
 # Load environment variables
 load_dotenv()
 
+# Shared client so every call reuses the same keep-alive HTTP/2 connection pool
+client = Groq(
+    api_key=os.getenv("GROQ_API_KEY"),
+    http_client=httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        timeout=60.0,
+    ),
+)
+
 def extract_sections_from_markdown(markdown_content: str) -> str:
     """
     Extracts text under the 'Beskrivning och passform' and "MATERIAL" sections from the provided markdown content.
@@ -15,10 +26,6 @@ def extract_sections_from_markdown(markdown_content: str) -> str:
     Returns:
         str: The extracted text as returned by the Groq API.
     """
-    client = Groq(
-        api_key=os.getenv("GROQ_API_KEY"),
-    )
-    
     chat_completion = client.chat.completions.create(
         messages=[
             {
@@ -1,4 +1,9 @@
-from openai import OpenAI
+import hashlib
+import os
+import sqlite3
+import httpx
+import orjson
+from openai import AsyncOpenAI
 from pydantic import BaseModel
 class ArticleSummary(BaseModel):
     sizes_and_availability: str
@@ -8,22 +13,69 @@ class ArticleSummary(BaseModel):
     color: str
     attributes: list[str]
 
-def extract_sections_from_markdown_openai(markdown_content: str, article_id: str, discounted_price: str, original_price: str, discount_percentage: str, gender: str, client) -> str:
+MODEL = "gpt-4o-mini"
+
+# Strict JSON schema for the structured output, built once so responses can be
+# decoded with orjson instead of being validated through pydantic on every call
+ARTICLE_SUMMARY_FORMAT = {
+    "type": "json_schema",
+    "name": "ArticleSummary",
+    "schema": {**ArticleSummary.model_json_schema(), "additionalProperties": False},
+    "strict": True,
+}
+
+# Keys every extracted summary must have
+ARTICLE_SUMMARY_FIELDS = frozenset(ArticleSummary.model_fields)
+
+def parse_summary(summary_json: str) -> dict:
+    """Decode a summary JSON, raising ValueError if it is not a complete ArticleSummary."""
+    summary = orjson.loads(summary_json)  # orjson.JSONDecodeError is a ValueError
+    if not isinstance(summary, dict):
+        raise ValueError("summary is not a JSON object")
+    missing = ARTICLE_SUMMARY_FIELDS - summary.keys()
+    if missing:
+        raise ValueError(f"summary is missing {sorted(missing)}")
+    return summary
+
+def create_openai_client(api_key: str | None = None) -> AsyncOpenAI:
+    """Create an AsyncOpenAI client on a keep-alive HTTP/2 connection pool, meant to be shared across calls."""
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        timeout=60.0,
+    )
+    return AsyncOpenAI(api_key=api_key, http_client=http_client)
+
+# Persistent cache of extracted summaries, keyed by a hash of model + prompt
+_cache_db = sqlite3.connect(os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"))
+_cache_db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+
+def cache_key(prompt: str) -> str:
+    """Return the cache key for a prompt sent to MODEL."""
+    return hashlib.blake2b(f"{MODEL}\0{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+def get_cached_summary(key: str) -> str | None:
+    """Return the cached summary JSON for a key, or None on a cache miss."""
+    row = _cache_db.execute("SELECT response FROM cache WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def cache_summary(key: str, summary_json: str) -> None:
+    """Store an extracted summary JSON under a key."""
+    _cache_db.execute("INSERT OR REPLACE INTO cache (key, response) VALUES (?, ?)", (key, summary_json))
+    _cache_db.commit()
+
+async def extract_sections_from_markdown_openai(markdown_content: str, article_id: str, discounted_price: str, original_price: str, discount_percentage: str, gender: str, client) -> str:
     """
     Extracts text under the 'Beskrivning och passform' and "MATERIAL" sections from the provided markdown content.
     
     Args:
         markdown_content (str): The markdown content to analyze.
+        client (AsyncOpenAI): Shared async client, so concurrent calls reuse its connection pool.
         
     Returns:
         str: The extracted text as returned by the OpenAI GPT-4 Mini model.
     """
-    # Set your OpenAI API key
-
-
-    response = client.responses.parse(
-    model="gpt-4o-mini",
-    input=f""" Structure and clean the text so it is easy for the GenAI Agent to search for the data in a vector database
+    prompt = f""" Structure and clean the text so it is easy for the GenAI Agent to search for the data in a vector database
                 
                 Output structure:
                 'sizes_and_availability': 'Text',
@@ -36,19 +88,39 @@ def extract_sections_from_markdown_openai(markdown_content: str, article_id: str
             
                 Please extract the above sections from the markdown content:
             {markdown_content}
-            """,
-    text_format=ArticleSummary,
-)
+            """
+
+    # Skip the API call if this exact prompt was already extracted
+    key = cache_key(prompt)
+    summary = None
+    summary_json = get_cached_summary(key)
+    if summary_json is not None:
+        try:
+            summary = parse_summary(summary_json)
+        except ValueError:
+            # Unusable entry from an older run: extract again and overwrite it
+            summary = None
+    if summary is None:
+        response = await client.responses.create(
+        model=MODEL,
+        input=prompt,
+        text={"format": ARTICLE_SUMMARY_FORMAT},
+    )
+        if response.status != "completed":
+            raise ValueError(f"OpenAI response {response.status}: {response.incomplete_details}")
+        # Only cache output that decodes to a complete summary (refusals have no JSON text)
+        summary = parse_summary(response.output_text)
+        cache_summary(key, response.output_text)
     
     
     
     return f"""Article ID: {article_id}
-    Sizes & Availability: {response.output_parsed.sizes_and_availability}
-    Description & Fit: {response.output_parsed.beskrivning_och_passform}
-    Material: {response.output_parsed.material}
-    Category: {response.output_parsed.category}
-    Color: {response.output_parsed.color}
-    Attributes: {response.output_parsed.attributes}
+    Sizes & Availability: {summary["sizes_and_availability"]}
+    Description & Fit: {summary["beskrivning_och_passform"]}
+    Material: {summary["material"]}
+    Category: {summary["category"]}
+    Color: {summary["color"]}
+    Attributes: {summary["attributes"]}
     Discounted Price: {discounted_price}
     Original Price: {original_price}
     Discount Percentage: {discount_percentage}
@@ -1,5 +1,58 @@
 import re
 
+# Price in Swedish format, e.g. "XXX,XX kr."
+PRICE_PATTERN = re.compile(r'(\d+,\d{2}\s*kr\.?)')
+
+# Patterns used by extract_hm_product_info
+MATERIAL_PATTERN = re.compile(r'Material\s*(.*?)(?=\n[A-ZÅÄÖ][a-zåäö\s]+(?:\n|$)|$)', re.DOTALL)
+MATERIAL_PATTERN_SIMPLE = re.compile(r'Material\s*(.*?)(?=Leverans|Skötselråd|HM\.com|$)', re.DOTALL)
+
+# Patterns used by extract_hm_product_info_formatted
+SIZES_SECTION_PATTERN = re.compile(r'(Välj storlek.*?)(?=Beskrivning)', re.DOTALL)
+DESCRIPTION_SECTION_PATTERN = re.compile(r'(Beskrivning.*?)(?=Material\s*\n)', re.DOTALL)
+MATERIAL_SECTION_PATTERN = re.compile(r'(Material\s*\n.*?Komposition\s*\n.*?\d+%.*?)(?=\nYtterligare materialinformation|\nVikten|\nFörklaring|\nSkötselråd|$)', re.DOTALL)
+
+# Patterns used by extract_specific_hm_sections
+START_PATTERN = re.compile(r'Välj storlek')
+END_PATTERNS = [
+    # Pattern 1: Stop right before "Ytterligare materialinformation" 
+    re.compile(r'(.*?Komposition.*?)(?=\s*###?\s*Ytterligare materialinformation)', re.DOTALL),
+    # Pattern 2: Stop at "Ytterligare materialinformation" (no ###)
+    re.compile(r'(.*?Komposition.*?)(?=\s*Ytterligare materialinformation)', re.DOTALL),
+    # Pattern 3: Get material composition and stop at next major section
+    re.compile(r'(.*?Komposition.*?(?:\n\s*[\*\-].*?)*?)(?=\s*###?\s*[A-ZÅÄÖ])', re.DOTALL),
+    # Pattern 4: Fallback - stop at any major section after Material
+    re.compile(r'(.*?Material.*?Komposition.*?)(?=\s*###?\s*[A-ZÅÄÖ])', re.DOTALL),
+]
+MATERIAL_HEADING_PATTERN = re.compile(r'Material')
+COMPOSITION_PATTERN = re.compile(r'Komposition.*?(?:\n\s*[\*\-].*?)*', re.DOTALL)
+
+# Sections we don't want (but keep sizes, description, and material), applied in
+# order: each pattern runs on the output of the previous one, so don't fuse them
+UNWANTED_SECTIONS_PATTERNS = [re.compile(p, re.DOTALL) for p in (
+    r'Hitta i butik.*?(?=Beskrivning|Material|$)',
+    r'Kolla tillgänglighet.*?(?=Beskrivning|Material|$)',
+    r'###?\s*Hitta i butik.*?(?=###?|Beskrivning|Material|$)',
+    r'###?\s*Kolla tillgänglighet.*?(?=###?|Beskrivning|Material|$)',
+    r'###?\s*Recensioner.*?(?=###?|Beskrivning|Material|$)',
+    r'###?\s*Upplevd storlek.*?(?=###?|Beskrivning|Material|$)',
+    r'###?\s*Längd.*?(?=###?|Beskrivning|Material|$)',
+)]
+
+def _text_between(text: str, start: str, end: str) -> str | None:
+    """
+    Returns the stripped text between the first `start` and the next `end` after it,
+    or None if either marker is missing. Uses str.find instead of a lazy regex scan.
+    """
+    start_index = text.find(start)
+    if start_index == -1:
+        return None
+    start_index += len(start)
+    end_index = text.find(end, start_index)
+    if end_index == -1:
+        return None
+    return text[start_index:end_index].strip()
+
 def extract_hm_product_info(markdown_content: str) -> dict:
     """
     Extracts specific product information from H&M product page markdown using regex patterns.
@@ -12,14 +65,11 @@ def extract_hm_product_info(markdown_content: str) -> dict:
     """
     
     # Extract price (format: "XXX,XX kr.")
-    price_pattern = r'(\d+,\d{2}\s*kr\.?)'
-    price_match = re.search(price_pattern, markdown_content)
+    price_match = PRICE_PATTERN.search(markdown_content)
     price = price_match.group(1) if price_match else None
     
     # Extract sizes section (from "Välj storlek" to "Storleksguide")
-    sizes_pattern = r'Välj storlek\s*(.*?)\s*Storleksguide'
-    sizes_match = re.search(sizes_pattern, markdown_content, re.DOTALL)
-    sizes_section = sizes_match.group(1).strip() if sizes_match else None
+    sizes_section = _text_between(markdown_content, 'Välj storlek', 'Storleksguide')
     
     # Clean up the sizes section to get individual sizes
     sizes = []
@@ -29,20 +79,16 @@ def extract_hm_product_info(markdown_content: str) -> dict:
         sizes = size_lines
     
     # Extract description section (from "Beskrivning" to "Material")
-    description_pattern = r'Beskrivning\s*(.*?)\s*Material'
-    description_match = re.search(description_pattern, markdown_content, re.DOTALL)
-    description = description_match.group(1).strip() if description_match else None
+    description = _text_between(markdown_content, 'Beskrivning', 'Material')
     
     # Extract material section (from "Material" to next major section or end)
     # Look for "Material" followed by content until we hit another section
-    material_pattern = r'Material\s*(.*?)(?=\n[A-ZÅÄÖ][a-zåäö\s]+(?:\n|$)|$)'
-    material_match = re.search(material_pattern, markdown_content, re.DOTALL)
+    material_match = MATERIAL_PATTERN.search(markdown_content)
     material = material_match.group(1).strip() if material_match else None
     
     # If the above doesn't work, try a simpler approach for material
     if not material:
-        material_pattern_simple = r'Material\s*(.*?)(?=Leverans|Skötselråd|HM\.com|$)'
-        material_match_simple = re.search(material_pattern_simple, markdown_content, re.DOTALL)
+        material_match_simple = MATERIAL_PATTERN_SIMPLE.search(markdown_content)
         material = material_match_simple.group(1).strip() if material_match_simple else None
     
     return {
@@ -65,23 +111,19 @@ def extract_hm_product_info_formatted(markdown_content: str) -> str:
     """
     
     # Extract price
-    price_pattern = r'(\d+,\d{2}\s*kr\.?)'
-    price_match = re.search(price_pattern, markdown_content)
+    price_match = PRICE_PATTERN.search(markdown_content)
     price = price_match.group(1) if price_match else "Price not found"
     
     # Extract the section from "Välj storlek" to just before "Beskrivning"
-    sizes_section_pattern = r'(Välj storlek.*?)(?=Beskrivning)'
-    sizes_match = re.search(sizes_section_pattern, markdown_content, re.DOTALL)
+    sizes_match = SIZES_SECTION_PATTERN.search(markdown_content)
     sizes_section = sizes_match.group(1) if sizes_match else ""
     
     # Extract description section from "Beskrivning" to "Material"
-    description_pattern = r'(Beskrivning.*?)(?=Material\s*\n)'
-    description_match = re.search(description_pattern, markdown_content, re.DOTALL)
+    description_match = DESCRIPTION_SECTION_PATTERN.search(markdown_content)
     description_section = description_match.group(1) if description_match else ""
     
     # Extract material section - look for "Material" followed by content
-    material_pattern = r'(Material\s*\n.*?Komposition\s*\n.*?\d+%.*?)(?=\nYtterligare materialinformation|\nVikten|\nFörklaring|\nSkötselråd|$)'
-    material_match = re.search(material_pattern, markdown_content, re.DOTALL)
+    material_match = MATERIAL_SECTION_PATTERN.search(markdown_content)
     material_section = material_match.group(1) if material_match else ""
     
     # Combine all sections
@@ -101,8 +143,7 @@ def extract_specific_hm_sections(markdown_content: str) -> str:
     """
     
     # Find the start of "Välj storlek" section
-    start_pattern = r'Välj storlek'
-    start_match = re.search(start_pattern, markdown_content)
+    start_match = START_PATTERN.search(markdown_content)
     
     if not start_match:
         return "Could not find 'Välj storlek' section"
@@ -112,21 +153,10 @@ def extract_specific_hm_sections(markdown_content: str) -> str:
     
     # Find the end point - we want to stop after Material composition but before "Ytterligare materialinformation"
     # Try multiple patterns to handle different product formats
-    end_patterns = [
-        # Pattern 1: Stop right before "Ytterligare materialinformation" 
-        r'(.*?Komposition.*?)(?=\s*###?\s*Ytterligare materialinformation)',
-        # Pattern 2: Stop at "Ytterligare materialinformation" (no ###)
-        r'(.*?Komposition.*?)(?=\s*Ytterligare materialinformation)',
-        # Pattern 3: Get material composition and stop at next major section
-        r'(.*?Komposition.*?(?:\n\s*[\*\-].*?)*?)(?=\s*###?\s*[A-ZÅÄÖ])',
-        # Pattern 4: Fallback - stop at any major section after Material
-        r'(.*?Material.*?Komposition.*?)(?=\s*###?\s*[A-ZÅÄÖ])',
-    ]
-    
     extracted_content = None
     
-    for pattern in end_patterns:
-        match = re.search(pattern, content_from_start, re.DOTALL)
+    for pattern in END_PATTERNS:
+        match = pattern.search(content_from_start)
         if match:
             extracted_content = match.group(1)
             break
@@ -134,12 +164,12 @@ def extract_specific_hm_sections(markdown_content: str) -> str:
     # If no pattern worked, try a simpler approach
     if not extracted_content:
         # Find Material section and extract a reasonable amount after it
-        material_match = re.search(r'Material', content_from_start)
+        material_match = MATERIAL_HEADING_PATTERN.search(content_from_start)
         if material_match:
             # Look for composition section and include it
-            composition_match = re.search(r'Komposition.*?(?:\n\s*[\*\-].*?)*', content_from_start[material_match.start():], re.DOTALL)
+            composition_match = COMPOSITION_PATTERN.search(content_from_start, material_match.start())
             if composition_match:
-                extracted_content = content_from_start[:material_match.start() + composition_match.end()]
+                extracted_content = content_from_start[:composition_match.end()]
             else:
                 extracted_content = content_from_start[:material_match.start() + 200]  # Fallback
         else:
@@ -148,18 +178,8 @@ def extract_specific_hm_sections(markdown_content: str) -> str:
     # Clean up the content - remove unwanted sections
     if extracted_content:
         # Remove sections we don't want (but keep sizes, description, and material)
-        unwanted_sections = [
-            r'Hitta i butik.*?(?=Beskrivning|Material|$)',
-            r'Kolla tillgänglighet.*?(?=Beskrivning|Material|$)',
-            r'###?\s*Hitta i butik.*?(?=###?|Beskrivning|Material|$)',
-            r'###?\s*Kolla tillgänglighet.*?(?=###?|Beskrivning|Material|$)',
-            r'###?\s*Recensioner.*?(?=###?|Beskrivning|Material|$)',
-            r'###?\s*Upplevd storlek.*?(?=###?|Beskrivning|Material|$)',
-            r'###?\s*Längd.*?(?=###?|Beskrivning|Material|$)',
-        ]
-        
-        for unwanted_pattern in unwanted_sections:
-            extracted_content = re.sub(unwanted_pattern, '', extracted_content, flags=re.DOTALL)
+        for unwanted_pattern in UNWANTED_SECTIONS_PATTERNS:
+            extracted_content = unwanted_pattern.sub('', extracted_content)
     
     # Clean up the extracted content
     if extracted_content:
@@ -176,8 +196,7 @@ def extract_specific_hm_sections(markdown_content: str) -> str:
         extracted_content = '\n'.join(cleaned_lines)
     
     # Extract price separately
-    price_pattern = r'(\d+,\d{2}\s*kr\.?)'
-    price_match = re.search(price_pattern, markdown_content)
+    price_match = PRICE_PATTERN.search(markdown_content)
     price = price_match.group(1) if price_match else None
     
     # Add price to the result
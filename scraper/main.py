@@ -1,51 +1,53 @@
 import asyncio
 import os
-import re
-from crawl4ai import AsyncWebCrawler
+from crawl4ai import AsyncWebCrawler, SemaphoreDispatcher
 from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
 from gcp.gcp_bucket import upload_urls_to_gcs
 
-def filter_garment_urls(links):
-    """Extract garment product URLs from a list of internal links."""
-    garment_urls = []
-    for link in links:
-        href = link.get('href', '')
-        if re.search(r"productpage", href):
-            garment_urls.append(href)
-    return garment_urls
-
-async def crawl_products(url, browser_config, run_config):
-    """Perform the web crawl and return the result."""
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        return await crawler.arun(url=url, config=run_config)
+def iter_garment_urls(links):
+    """Yield garment product URLs from a list of internal links."""
+    return (href for link in links if (href := link.get('href')) and "productpage" in href)
 
 async def main():
 
     # Configure the crawler
-    browser_config = BrowserConfig(verbose=True)
+    # Listing pages are only read for their links, so skip images and other rich content
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=True,
+        text_mode=True,
+        light_mode=True,
+    )
     run_config = CrawlerRunConfig(
         word_count_threshold=10,
         excluded_tags=['form', 'header'],
         exclude_external_links=True,
-        process_iframes=True,
-        remove_overlay_elements=True,
     )
-    all_urls = []
+    # Insertion-ordered dedupe, so the uploaded list keeps page order from run to run
+    all_urls = {}
     start_page = int(os.getenv('START_PAGE', '1'))
     end_page = int(os.getenv('END_PAGE', '3'))
+    max_concurrent_pages = int(os.getenv('MAX_CONCURRENT_PAGES', '16'))
+    page_urls = [
+        f"https://www2.hm.com/sv_se/dam/produkter/se-alla.html?page={index}"
+        for index in range(start_page, end_page)
+    ]
     
-    for index in range(start_page, end_page):
-    # Run the crawl on the product page
-        result = await crawl_products(
-            f"https://www2.hm.com/sv_se/dam/produkter/se-alla.html?page={index}",
-            browser_config,
-            run_config
+    # Let crawl4ai run the product pages concurrently in one browser
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        results = await crawler.arun_many(
+            urls=page_urls,
+            config=run_config,
+            dispatcher=SemaphoreDispatcher(semaphore_count=max_concurrent_pages),
         )
 
+    # The dispatcher returns results as they finish; put them back in page order
+    page_order = {url: index for index, url in enumerate(page_urls)}
+    results = sorted(results, key=lambda result: page_order.get(result.url, len(page_order)))
+    for result in results:
         if result.success:
-            # Filter garment URLs from the internal links
-            garment_urls = filter_garment_urls(result.links.get("internal", []))
-            all_urls.extend(garment_urls)
+            # Stream garment URLs from the internal links straight into the dict
+            all_urls.update(dict.fromkeys(iter_garment_urls(result.links.get("internal", ()))))
         else:
             print(f"Crawl failed: {result.error_message}")
     upload_urls_to_gcs(all_urls)
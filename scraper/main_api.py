@@ -1,71 +1,210 @@
 import asyncio
 import os
-import re
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
 from crawl4ai import AsyncWebCrawler
 from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
 from gcp.gcp_bucket import upload_urls_to_gcs
+from orjson_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# One event loop for the whole process, running in a background thread, so
+# requests share it (and the browser) instead of each building its own
+_loop = asyncio.new_event_loop()
+# Bound the loop's default executor (DNS lookups etc.) for small Cloud Run instances
+_loop.set_default_executor(ThreadPoolExecutor(max_workers=4, thread_name_prefix="loop-io"))
+threading.Thread(target=_loop.run_forever, daemon=True).start()
+
+# Started lazily on the shared loop by get_crawler()
+_crawler_task = None
+
+# Caps listing pages in flight across all requests, since they share one browser;
+# created lazily by get_page_semaphore() so it belongs to the shared loop
+_page_semaphore = None
+
+# Blocking GCS uploads run here so they don't stall the shared loop
+_upload_executor = ThreadPoolExecutor(max_workers=4)
+
+def run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
 
 def filter_garment_urls(links):
     """Extract garment product URLs from a list of internal links."""
-    garment_urls = []
-    for link in links:
-        href = link.get('href', '')
-        if re.search(r"productpage", href):
-            garment_urls.append(href)
-    return garment_urls
-
-async def crawl_products(url, browser_config, run_config):
-    """Perform the web crawl and return the result."""
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        return await crawler.arun(url=url, config=run_config)
+    return [href for link in links if (href := link.get('href')) and "productpage" in href]
 
-async def scrape_hm_products(start_page, end_page):
-    """Main scraping function that can be called with custom page ranges."""
-    # Configure the crawler
-    browser_config = BrowserConfig(verbose=True)
-    run_config = CrawlerRunConfig(
-        word_count_threshold=10,
-        excluded_tags=['form', 'header'],
-        exclude_external_links=True,
-        process_iframes=True,
-        remove_overlay_elements=True,
+# The health check body never changes, so serialize it once at import
+HEALTH_BODY = orjson.dumps({"status": "healthy"})
+
+# Maximum number of listing pages crawled at the same time
+MAX_CONCURRENT_PAGES = int(os.getenv('MAX_CONCURRENT_PAGES', '5'))
+
+def get_page_semaphore():
+    """Return the semaphore shared by all requests, creating it on first use."""
+    global _page_semaphore
+    if _page_semaphore is None:
+        _page_semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+    return _page_semaphore
+
+def is_browser_closed_error(message):
+    """Return True for Playwright errors meaning the page, context or browser is gone."""
+    return "has been closed" in str(message).lower()
+
+# Crawl configuration for listing pages, built once and shared by all requests
+RUN_CONFIG = CrawlerRunConfig(
+    word_count_threshold=10,
+    excluded_tags=['form', 'header'],
+    exclude_external_links=True,
+)
+
+async def crawl_products(crawler, url, run_config, semaphore):
+    """Perform the web crawl with a shared crawler and return the result."""
+    async with semaphore:
+        try:
+            result = await crawler.arun(url=url, config=run_config)
+        except Exception as e:
+            if is_browser_closed_error(e):
+                await reset_crawler(crawler)
+            raise
+    if not result.success and is_browser_closed_error(result.error_message):
+        await reset_crawler(crawler)
+    return result
+
+async def start_crawler():
+    """Start the browser shared by all requests."""
+    # Listing pages are only read for their links, so skip images and other rich content
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=True,
+        text_mode=True,
+        light_mode=True,
     )
+    crawler = AsyncWebCrawler(config=browser_config)
+    await crawler.start()
+    return crawler
+
+async def get_crawler():
+    """Return the shared crawler, starting it on first use."""
+    global _crawler_task
+    if _crawler_task is None:
+        _crawler_task = asyncio.ensure_future(start_crawler())
+    try:
+        return await _crawler_task
+    except Exception:
+        # Let the next request try to start the browser again
+        _crawler_task = None
+        raise
+
+async def reset_crawler(crawler):
+    """Drop a crashed shared crawler so the next request starts a fresh browser."""
+    global _crawler_task
+    # Only the first failing page resets; later ones see a newer task
+    if _crawler_task is not None and _crawler_task.done() and not _crawler_task.cancelled() \
+            and _crawler_task.exception() is None and _crawler_task.result() is crawler:
+        _crawler_task = None
+        print("Shared browser closed unexpectedly, restarting it on the next request")
+        try:
+            await crawler.close()
+        except Exception:
+            pass
+
+async def crawl_page_range(start_page, end_page):
+    """Crawl the listing pages of a page range and return their garment URLs."""
+    # Insertion-ordered dedupe, so the uploaded list keeps page order from run to run
+    all_urls = {}
+    pages = range(start_page, end_page + 1)
+    semaphore = get_page_semaphore()
     
-    all_urls = []
+    # Run the crawls on the product pages concurrently with the shared browser
+    crawler = await get_crawler()
+    results = await asyncio.gather(*[
+        crawl_products(
+            crawler,
+            f"https://www2.hm.com/sv_se/dam/produkter/se-alla.html?page={index}",
+            RUN_CONFIG,
+            semaphore
+        )
+        for index in pages
+    ], return_exceptions=True)
     
-    for index in range(start_page, end_page + 1):
-        try:
-            # Run the crawl on the product page
-            result = await crawl_products(
-                f"https://www2.hm.com/sv_se/dam/produkter/se-alla.html?page={index}",
-                browser_config,
-                run_config
-            )
-
-            if result.success:
-                # Filter garment URLs from the internal links
-                garment_urls = filter_garment_urls(result.links.get("internal", []))
-                all_urls.extend(garment_urls)
-                print(f"Successfully scraped page {index}, found {len(garment_urls)} URLs")
-            else:
-                print(f"Crawl failed for page {index}: {result.error_message}")
-        except Exception as e:
-            print(f"Error scraping page {index}: {str(e)}")
+    for index, result in zip(pages, results):
+        if isinstance(result, Exception):
+            print(f"Error scraping page {index}: {str(result)}")
+        elif result.success:
+            # Filter garment URLs from the internal links
+            garment_urls = filter_garment_urls(result.links.get("internal", []))
+            all_urls.update(dict.fromkeys(garment_urls))
+            print(f"Successfully scraped page {index}, found {len(garment_urls)} URLs")
+        else:
+            print(f"Crawl failed for page {index}: {result.error_message}")
+    
+    return all_urls
+
+async def upload_urls(all_urls):
+    """Upload URLs to GCS off the shared loop."""
+    await asyncio.get_running_loop().run_in_executor(_upload_executor, upload_urls_to_gcs, all_urls)
+
+def scrape_result(start_page, end_page, urls_found):
+    """Build the response for one scraped page range."""
+    if urls_found:
+        return {"success": True, "urls_found": urls_found, "message": f"Successfully scraped pages {start_page}-{end_page}"}
+    return {"success": False, "urls_found": 0, "message": "No URLs found"}
+
+async def scrape_hm_products(start_page, end_page):
+    """Main scraping function that can be called with custom page ranges."""
+    all_urls = await crawl_page_range(start_page, end_page)
     
     # Upload to GCS
     if all_urls:
-        upload_urls_to_gcs(all_urls)
-        return {"success": True, "urls_found": len(all_urls), "message": f"Successfully scraped pages {start_page}-{end_page}"}
-    else:
-        return {"success": False, "urls_found": 0, "message": "No URLs found"}
+        await upload_urls(all_urls)
+    return scrape_result(start_page, end_page, len(all_urls))
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for Cloud Run."""
-    return jsonify({"status": "healthy"})
+    return app.response_class(HEALTH_BODY, mimetype="application/json")
+
+def parse_page_range(data):
+    """Validate a page range payload and return (start_page, end_page, error_message)."""
+    # Extract start_page and end_page from request
+    start_page = data.get('start_page')
+    end_page = data.get('end_page')
+    
+    if start_page is None or end_page is None:
+        return None, None, "start_page and end_page are required"
+    
+    # Validate page numbers
+    try:
+        start_page = int(start_page)
+        end_page = int(end_page)
+    except (TypeError, ValueError):
+        return None, None, "start_page and end_page must be integers"
+    
+    if start_page < 1 or end_page < start_page:
+        return None, None, "Invalid page range. start_page must be >= 1 and end_page must be >= start_page"
+    
+    return start_page, end_page, None
+
+async def scrape_page_ranges(page_ranges):
+    """Scrape several page ranges one after another and upload their URLs together."""
+    all_urls = {}
+    urls_found = []
+    for start_page, end_page in page_ranges:
+        urls = await crawl_page_range(start_page, end_page)
+        urls_found.append(len(urls))
+        all_urls.update(urls)
+    
+    # One upload for the whole batch, since every range writes the same blob
+    if all_urls:
+        await upload_urls(all_urls)
+    return [
+        scrape_result(start_page, end_page, count)
+        for (start_page, end_page), count in zip(page_ranges, urls_found)
+    ]
 
 @app.route('/scrape', methods=['POST'])
 def scrape_endpoint():
@@ -77,27 +216,40 @@ def scrape_endpoint():
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
         
-        # Extract start_page and end_page from request
-        start_page = data.get('start_page')
-        end_page = data.get('end_page')
+        start_page, end_page, error = parse_page_range(data)
+        if error:
+            return jsonify({"error": error}), 400
         
-        if start_page is None or end_page is None:
-            return jsonify({"error": "start_page and end_page are required"}), 400
+        # Run the scraping function
+        result = run_async(scrape_hm_products(start_page, end_page))
         
-        # Validate page numbers
-        try:
-            start_page = int(start_page)
-            end_page = int(end_page)
-        except ValueError:
-            return jsonify({"error": "start_page and end_page must be integers"}), 400
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@app.route('/scrape_batch', methods=['POST'])
+def scrape_batch_endpoint():
+    """API endpoint to scrape several page ranges in one request."""
+    try:
+        data = request.get_json()
         
-        if start_page < 1 or end_page < start_page:
-            return jsonify({"error": "Invalid page range. start_page must be >= 1 and end_page must be >= start_page"}), 400
+        if not isinstance(data, dict) or not isinstance(data.get('tasks'), list) or not data['tasks']:
+            return jsonify({"error": "A non-empty 'tasks' list is required"}), 400
         
-        # Run the scraping function
-        result = asyncio.run(scrape_hm_products(start_page, end_page))
+        page_ranges = []
+        for index, task in enumerate(data['tasks']):
+            if not isinstance(task, dict):
+                return jsonify({"error": f"Task {index} must be an object"}), 400
+            start_page, end_page, error = parse_page_range(task)
+            if error:
+                return jsonify({"error": f"Task {index}: {error}"}), 400
+            page_ranges.append((start_page, end_page))
         
-        return jsonify(result)
+        # Run all ranges in one call instead of one request per range
+        results = run_async(scrape_page_ranges(page_ranges))
+        
+        return jsonify({"results": results})
         
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
@@ -109,6 +261,7 @@ def root():
         "message": "H&M Scraper API",
         "endpoints": {
             "POST /scrape": "Scrape H&M products with start_page and end_page parameters",
+            "POST /scrape_batch": "Scrape several page ranges given as a 'tasks' list",
             "GET /health": "Health check endpoint"
         },
         "example_request": {
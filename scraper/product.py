@@ -1,112 +1,204 @@
 import time
 import asyncio
 import os
+import orjson
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 from crawl4ai import AsyncWebCrawler
 from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
 import re
 from groq import Groq
-from llm.openai import extract_sections_from_markdown_openai
 from gcp.gcp_bucket import download_urls_from_gcs, upload_urls_to_gcs, upload_image_mapping_to_gcs
-from llm.openai import extract_sections_from_markdown_openai
-from transformation.hardcoded_re import extract_product_id, extract_urls_from_markdown, between_size_and_material, extract_price_info, count_most_frequent_word
-from openai import OpenAI
+from llm.openai import create_openai_client, extract_sections_from_markdown_openai
+from transformation.hardcoded_re import extract_product_id, extract_product_page_info
+from crawl_retry import backoff_delay, is_transient_failure
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = create_openai_client(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Maximum number of product pages crawled at once
+MAX_CONCURRENT_CRAWLS = 20
 
-image_mapping = {}
+# Maximum number of OpenAI extraction requests in flight at once
+MAX_CONCURRENT_LLM_CALLS = 32
+
+# Status codes that signal the server is overloaded and we should back off
+BACKOFF_STATUS_CODES = {429, 503}
 
+# Upper bound in seconds for an overload pause, whether from Retry-After or doubling
+MAX_RETRY_AFTER = 60
 
+# Each quiet stretch this long without an overload response halves the pause again
+OVERLOAD_DECAY_SECONDS = 30
+
+image_mapping = {}
+
+# Append-only JSON Lines file of products finished in the current run, so a
+# re-run after a crash resumes instead of starting over; removed after upload
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoint.jsonl")
+
+# article_id -> {"content": ..., "image_url": ...} for products finished before a crash
+checkpoint = {}
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """Load finished products from the checkpoint file, if it exists."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    *lines, partial = data.split(b"\n")
+    if partial:
+        # A crash mid-write leaves an unterminated last line; drop it so the
+        # next append starts on a fresh line
+        print(f"Dropping truncated last line of {path}")
+        with open(path, "r+b") as f:
+            f.truncate(len(data) - len(partial))
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entry = orjson.loads(line)
+            checkpoint[entry["article_id"]] = entry
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            print(f"Skipping unreadable checkpoint line in {path}")
+    print(f"Loaded {len(checkpoint)} finished products from {path}")
+
+def clear_checkpoint(path=CHECKPOINT_PATH):
+    """Forget finished products once a run's results are uploaded, so the next run crawls fresh data."""
+    checkpoint.clear()
+    if os.path.exists(path):
+        os.remove(path)
+
+def save_checkpoint(article_id, content, image_url, path=CHECKPOINT_PATH):
+    """Record a finished product in memory and append it to the checkpoint file."""
+    entry = {"article_id": article_id, "content": content, "image_url": image_url}
+    checkpoint[article_id] = entry
+    with open(path, "ab") as f:
+        f.write(orjson.dumps(entry) + b"\n")
+
+# Event-loop time before which no new crawl should start, shared by all tasks
+# so one overload response pauses every request to the host, not just the one that saw it
+_crawl_resume_at = 0.0
+
+# Without Retry-After the shared pause is 2 ** _overload_level seconds
+_overload_level = 0
+_last_overload_at = None
+
+def retry_delay(result, level):
+    """Seconds to pause after an overload response: Retry-After if given, else 2 ** level."""
+    headers = getattr(result, "response_headers", None) or {}
+    retry_after = str(headers.get("retry-after") or headers.get("Retry-After") or "")
+    if retry_after.isdigit():
+        return min(int(retry_after), MAX_RETRY_AFTER)
+    return min(2 ** level, MAX_RETRY_AFTER)
+
+def record_overload(result):
+    """Pause all crawls after an overload response."""
+    global _crawl_resume_at, _overload_level, _last_overload_at
+    now = asyncio.get_running_loop().time()
+    if now < _crawl_resume_at:
+        # Sent before the current pause began, which already covers it
+        _last_overload_at = now
+        return
+    if _last_overload_at is not None:
+        # Double the pause for an overload after the last one ended, less one
+        # halving for every OVERLOAD_DECAY_SECONDS that passed without one
+        quiet_periods = int((now - _last_overload_at) // OVERLOAD_DECAY_SECONDS)
+        _overload_level = max(_overload_level + 1 - quiet_periods, 0)
+    _last_overload_at = now
+    _crawl_resume_at = now + retry_delay(result, _overload_level)
+
+async def wait_for_rate_limit():
+    """Sleep until the shared back-off window set by an overload response has passed."""
+    delay = _crawl_resume_at - asyncio.get_running_loop().time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+
+async def crawl_url(url, crawler, run_config, client, crawl_semaphore, llm_semaphore, executor, max_retries=3):
+    """Crawl a single URL with a shared crawler and retry logic for better reliability."""
+    # Skip products finished in an earlier run
+    entry = checkpoint.get(extract_product_id(url))
+    if entry:
+        print(f"Skipping {url}: already processed")
+        if entry["image_url"]:
+            image_mapping[entry["article_id"]] = entry["image_url"]
+        return entry["content"]
 
-async def crawl_url(url, browser_config, run_config, client, max_retries=3):
-    """Crawl a single URL with retry logic for better reliability."""
     for attempt in range(max_retries):
         try:
-            async with AsyncWebCrawler(config=browser_config) as crawler:
+            # Wait out any overload pause before taking a crawl slot, not while holding one
+            await wait_for_rate_limit()
+            async with crawl_semaphore:
                 result = await crawler.arun(url=url, config=run_config)
+            
+            if result.success:
+                print(f"Successfully crawled {url} on attempt {attempt + 1}")
+                # Run the CPU-bound parsing in a worker process so it does not block the event loop
+                page_info = await asyncio.get_running_loop().run_in_executor(
+                    executor, extract_product_page_info, url, str(result.markdown)
+                )
+            
+                if page_info is None:
+                    print(f"Warning: No content extracted from {url} - pattern not found")
+                    return None
+                    
+                extracted_content, gender, article_id, url_image, discounted_price, original_price, discount_percentage = page_info
+                if url_image:
+                    image_mapping[article_id] = url_image
+                async with llm_semaphore:
+                    extracted_content_cleaned = await extract_sections_from_markdown_openai(extracted_content,article_id, discounted_price, original_price, discount_percentage, gender, client)
+                if article_id:
+                    save_checkpoint(article_id, extracted_content_cleaned, url_image)
+                return extracted_content_cleaned
                 
-                if result.success:
-                    print(f"Successfully crawled {url} on attempt {attempt + 1}")
-                    extracted_content = between_size_and_material(result.markdown)
-               
-                    gender = count_most_frequent_word(result.markdown)
-                   
-                
-                    if extracted_content is None:
-                        print(f"Warning: No content extracted from {url} - pattern not found")
-                        
-                    else:
-                        article_id = extract_product_id(url)
-
-                        url_image = extract_urls_from_markdown(result.markdown)
-                        discounted_price, original_price, discount_percentage = extract_price_info(result.markdown)
-                        if url_image:
-                            image_mapping[article_id] = url_image
-                        extracted_content_cleaned = extract_sections_from_markdown_openai(extracted_content,article_id, discounted_price, original_price, discount_percentage, gender, client)
-                    return extracted_content_cleaned
+            else:
+                print(f"Attempt {attempt + 1} failed for {url}: {result.error_message}")
+                if not is_transient_failure(result):
+                    print(f"Not retrying {url}: status code {result.status_code}")
+                    return None
+                if attempt == max_retries - 1:
+                    print(f"All attempts failed for {url}")
+                    return None
+                if getattr(result, "status_code", None) in BACKOFF_STATUS_CODES:
+                    # Server is overloaded: pause all crawls until it asks us to resume;
+                    # wait_for_rate_limit() does the waiting before the next attempt
+                    record_overload(result)
+                    continue
                     
-                else:
-                    print(f"Attempt {attempt + 1} failed for {url}: {result.error_message}")
-                    if attempt == max_retries - 1:
-                        print(f"All attempts failed for {url}")
-                        return None
-                        
         except Exception as e:
             print(f"Attempt {attempt + 1} failed for {url}: {str(e)}")
             if attempt == max_retries - 1:
                 print(f"All attempts failed for {url}")
                 return None
-            # Wait before retrying
-            await asyncio.sleep(2 ** attempt)  # Exponential backoff: 1s, 2s, 4s
+        
+        # Back off before retrying, for failed results and exceptions alike
+        await asyncio.sleep(backoff_delay(attempt))
     
     return None
 
-def create_batches(items, batch_size):
-    """Split a list into batches of specified size."""
-    for i in range(0, len(items), batch_size):
-        yield items[i:i + batch_size]
-
-async def process_batch(urls, browser_config, run_config, client, batch_num):
-    """Process a single batch of URLs."""
-    print(f"Processing batch {batch_num} with {len(urls)} URLs...")
-    
-    tasks = [
-        crawl_url(url, browser_config, run_config, client)
-        for url in urls
-    ]
-    
-    batch_results = await asyncio.gather(*tasks)
-    
-    print(f"Completed batch {batch_num}")
-    
-    return batch_results
-
 async def main():
     start_time = time.perf_counter()
     
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    load_checkpoint()
+    crawl_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CRAWLS)
+    llm_semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
     garment_urls = download_urls_from_gcs()[:5]
     browser_config = BrowserConfig()  # Default browser configuration
     run_config = CrawlerRunConfig()     # Default crawl run configuration
 
     print(f"Total URLs to process: {len(garment_urls)}")
     
-    # Process URLs in batches of 5
-    batch_size = 5
-    all_content = []
-    
-    for batch_num, batch_urls in enumerate(create_batches(garment_urls, batch_size), 1):
-        batch_results = await process_batch(batch_urls, browser_config, run_config, client, batch_num)
-        all_content.extend(batch_results)
-        
-        # Optional: Add a small delay between batches to be gentle on the server
-        if batch_num < len(garment_urls) // batch_size + (1 if len(garment_urls) % batch_size else 0):
-            print("Waiting 2 seconds before next batch...")
-            await asyncio.sleep(2)
+    # Crawl all URLs concurrently with one shared browser; the semaphores cap load
+    with ProcessPoolExecutor() as executor:
+        async with AsyncWebCrawler(config=browser_config) as crawler:
+            all_content = await asyncio.gather(*[
+                crawl_url(url, crawler, run_config, client, crawl_semaphore, llm_semaphore, executor)
+                for url in garment_urls
+            ])
 
     # Filter out None results and track failures
     valid_content = [content for content in all_content if content is not None]
@@ -122,6 +214,8 @@ async def main():
         project_id="voii-459718"
     )
     upload_image_mapping_to_gcs(image_mapping)
+    # Everything is uploaded; the checkpoint was only for resuming this run
+    clear_checkpoint()
 
     elapsed = time.perf_counter() - start_time
     print(f"Execution time: {elapsed:.2f} seconds")
@@ -1,17 +1,37 @@
 import html
 import re
-def extract_urls_from_markdown(text: str) -> list[str]:
+
+# H&M image URL inside markdown image syntax: [![Alt text](https://image.hm.com/assets/...)]
+IMAGE_URL_PATTERN = re.compile(r'\[!\[.*?\]\((https://image\.hm\.com/assets/[^\)]+)\)\]')
+
+# Text between "Välj storlek" and the first material/care heading after it,
+# generous with white-space inside the headings
+SIZE_TO_MATERIAL_PATTERN = re.compile(
+    r"välj\s+storlek"               # start
+    r"\s*(.*?)\s*"                  # everything in between
+    r"(?:ytterligare\s+materialinformation"  # end option 1
+    r"|förklaring\s+av\s+materialen"         # end option 2
+    r"|skötselråd)",                          # end option 3
+    re.DOTALL | re.IGNORECASE,
+)
+
+# Content between the 'Inte sparat i favoriter' and 'Färg:' sections
+PRICE_SECTION_PATTERN = re.compile(r'Inte sparat i favoriter\s*(.*?)\s*(?:##\s*)?Färg:', re.DOTALL | re.IGNORECASE)
+
+# Prices in Swedish format (XXX,XX kr)
+PRICE_PATTERN = re.compile(r'(\d+,\d{2})\s*kr')
+
+def extract_urls_from_markdown(text: str) -> str | None:
     """
-    Extract all H&M image URLs from markdown image syntax like:
+    Extract the first H&M image URL from markdown image syntax like:
     [![Alt text](https://image.hm.com/assets/hm/path/image.jpg)](https://example.com/page.html)
-    Returns a list of all found H&M image URLs without query parameters.
+    Returns the image URL without query parameters, or None if no image is found.
     """
-    pattern = r'\[!\[.*?\]\((https://image\.hm\.com/assets/[^\)]+)\)\]'
-    url = re.findall(pattern, text)[0]
-    # Remove query parameters from each URL
-    clean_urls = url.split("?")[0] 
-   
-    return clean_urls
+    match = IMAGE_URL_PATTERN.search(text)
+    if not match:
+        return None
+    # Remove query parameters from the URL
+    return match.group(1).split("?", 1)[0]
 
 def extract_product_id(text: str) -> str | None:
     """
@@ -19,9 +39,12 @@ def extract_product_id(text: str) -> str | None:
     https://www2.hm.com/sv_se/productpage.1259175004.html
     Returns the numeric product ID (e.g., '1259175004')
     """
-    pattern = r'productpage\.(\d+)\.html'
-    match = re.search(pattern, text)
-    return match.group(1) if match else None
+    # Plain substring splits; cheaper than a regex on this fixed URL shape
+    _, found, rest = text.partition('productpage.')
+    if not found:
+        return None
+    product_id, found, _ = rest.partition('.html')
+    return product_id if found and product_id.isdecimal() else None
 
 def between_size_and_material(text: str) -> str | None:
     """
@@ -29,47 +52,16 @@ def between_size_and_material(text: str) -> str | None:
     "Välj storlek"  …  "Ytterligare materialinformation"
     """
 
-    # 1) normalise the text for pattern matching --------------------------
-    txt_normalized = html.unescape(text)          # turns &nbsp; → '\xa0' etc.
-    txt_normalized = txt_normalized.replace('\xa0', ' ')     # non-breaking space → space
-    txt_normalized = txt_normalized.lower()                  # ignore case completely
-
-    # 2) regex: be generous with white-space inside the headings ------------
-    pattern = (
-        r"välj\s+storlek"               # start
-        r"\s*(.*?)\s*"                  # everything in between
-        r"(?:ytterligare\s+materialinformation"  # end option 1
-        r"|förklaring\s+av\s+materialen"         # end option 2
-        r"|skötselråd)"                           # end option 3  ← NEW
-    )
-
-    # 3) Find the match in normalized text to get positions
-    m = re.search(pattern, txt_normalized, flags=re.DOTALL)
-    
-    if m:
-        # Get the original text preserving formatting
-        original_text = html.unescape(text).replace('\xa0', ' ')
-        
-        # Find the same pattern in original text (case-insensitive)
-        original_pattern = (
-            r"välj\s+storlek"
-            r"\s*(.*?)\s*"
-            r"(?:ytterligare\s+materialinformation"
-            r"|förklaring\s+av\s+materialen"
-            r"|skötselråd)"
-        )
-        
-        original_match = re.search(original_pattern, original_text, flags=re.DOTALL | re.IGNORECASE)
-        
-        if original_match:
-            text = "välj storlek " + original_match.group(1).strip()
-        else:
-            text = "välj storlek " + m.group(1).strip()
-    else:
-        text = None
-    
-    
-    return text
+    # 1) decode entities; \s in the pattern already matches '\xa0' -------
+    txt_unescaped = html.unescape(text)           # turns &nbsp; → '\xa0' etc.
+
+    # 2) single case-insensitive search on the unescaped text --------------
+    m = SIZE_TO_MATERIAL_PATTERN.search(txt_unescaped)
+    if not m:
+        return None
+
+    # 3) non-breaking space → space, only on the extracted section ---------
+    return "välj storlek " + m.group(1).replace('\xa0', ' ').strip()
 
 
 def extract_price_info(text):
@@ -82,18 +74,14 @@ def extract_price_info(text):
         - If one price: it's the original price, discounted_price is None
         - discount_percentage is "no discount" if only one price, otherwise percentage as string
     """
-    # Pattern to find content between the two sections
-    pattern = r'Inte sparat i favoriter\s*(.*?)\s*(?:##\s*)?Färg:'
-    match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+    match = PRICE_SECTION_PATTERN.search(text)
     
     if not match:
         return None, None, "no discount"
     
     content = match.group(1).strip()
     
-    # Pattern to extract prices in Swedish format (XXX,XX kr)
-    price_pattern = r'(\d+,\d{2})\s*kr'
-    prices = re.findall(price_pattern, content)
+    prices = PRICE_PATTERN.findall(content)
     
     if len(prices) == 0:
         return None, None, "no discount"
@@ -145,3 +133,22 @@ def count_most_frequent_word(text):
     
     return most_frequent_word
 
+
+def extract_product_page_info(url, markdown):
+    """
+    Run all regex extractions for one crawled product page. Kept as a single
+    module-level function so it can be shipped to a process pool in one call.
+
+    Returns:
+        tuple: (extracted_content, gender, article_id, image_url, discounted_price, original_price, discount_percentage)
+        or None if the size-to-material section is not found
+    """
+    extracted_content = between_size_and_material(markdown)
+    if extracted_content is None:
+        return None
+
+    gender = count_most_frequent_word(markdown)
+    article_id = extract_product_id(url)
+    image_url = extract_urls_from_markdown(markdown)
+    discounted_price, original_price, discount_percentage = extract_price_info(markdown)
+    return extracted_content, gender, article_id, image_url, discounted_price, original_price, discount_percentage
@@ -1,5 +1,8 @@
+import hashlib
 import io
 import os
+import types
+import orjson
 import requests
 from dotenv import load_dotenv
 from openai import OpenAI
@@ -11,12 +14,15 @@ load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))        # assumes OPENAI_API_KEY is set
                           # or client = OpenAI(api_key="sk-…")
 
+# Digest and ids of the last uploaded corpus, so unchanged corpora aren't re-uploaded
+UPLOAD_MANIFEST_PATH = os.getenv("UPLOAD_MANIFEST_PATH", "upload_manifest.json")
+
 def create_file(client, data, *, filename="data.txt"):
     """
     data can be:
       • a URL (http/https)
       • a local file path
-      • a list/tuple of strings                  <-- NEW
+      • a list/tuple/generator of strings        <-- NEW
     """
     # 1. URL ------------------------------------------------------------------
     if isinstance(data, str) and (data.startswith("http://") or data.startswith("https://")):
@@ -30,14 +36,14 @@ def create_file(client, data, *, filename="data.txt"):
         file_obj   = open(data, "rb")                     # will be closed by openai-python
         file_tuple = (data.split('/')[-1], file_obj)
 
-    # 3. List/tuple of strings -----------------------------------------------
-    elif isinstance(data, (list, tuple)):
-        joined     = "\n".join(map(str, data))            # join however you like
-        file_obj   = io.BytesIO(joined.encode("utf-8"))
-        file_tuple = (filename, file_obj)
+    # 3. List/tuple/generator of strings -------------------------------------
+    elif isinstance(data, (list, tuple, types.GeneratorType)):
+        # Encode entry by entry and hand the SDK the bytes directly
+        payload    = b"\n".join(str(entry).encode("utf-8") for entry in data)
+        file_tuple = (filename, payload)
 
     else:
-        raise TypeError("data must be a URL, a local path, or a list/tuple of strings")
+        raise TypeError("data must be a URL, a local path, or a list/tuple/generator of strings")
 
     # Upload
     result = client.files.create(
@@ -50,6 +56,21 @@ def create_file(client, data, *, filename="data.txt"):
 
 
 
+# Field prefix in the processed garment lines -> key in the structured garment
+GARMENT_FIELDS = {
+    'Article ID': 'article_id',
+    'Sizes & Availability': 'sizes_availability',
+    'Description & Fit': 'description',
+    'Material': 'material',
+    'Category': 'category',
+    'Color': 'color',
+    'Attributes': 'attributes',
+    'Discounted Price': 'discounted_price',
+    'Original Price': 'original_price',
+    'Discount Percentage': 'discount_percentage',
+    'Gender': 'gender',
+}
+
 def parse_garments_to_structured_format(garment_data):
     """
     Parse the flat garment data list into structured format to prevent misattribution.
@@ -70,28 +91,10 @@ def parse_garments_to_structured_format(garment_data):
             continue
             
         # Parse each field
-        if item.startswith('Article ID:'):
-            current_garment['article_id'] = item.replace('Article ID:', '').strip()
-        elif item.startswith('Sizes & Availability:'):
-            current_garment['sizes_availability'] = item.replace('Sizes & Availability:', '').strip()
-        elif item.startswith('Description & Fit:'):
-            current_garment['description'] = item.replace('Description & Fit:', '').strip()
-        elif item.startswith('Material:'):
-            current_garment['material'] = item.replace('Material:', '').strip()
-        elif item.startswith('Category:'):
-            current_garment['category'] = item.replace('Category:', '').strip()
-        elif item.startswith('Color:'):
-            current_garment['color'] = item.replace('Color:', '').strip()
-        elif item.startswith('Attributes:'):
-            current_garment['attributes'] = item.replace('Attributes:', '').strip()
-        elif item.startswith('Discounted Price:'):
-            current_garment['discounted_price'] = item.replace('Discounted Price:', '').strip()
-        elif item.startswith('Original Price:'):
-            current_garment['original_price'] = item.replace('Original Price:', '').strip()
-        elif item.startswith('Discount Percentage:'):
-            current_garment['discount_percentage'] = item.replace('Discount Percentage:', '').strip()
-        elif item.startswith('Gender:'):
-            current_garment['gender'] = item.replace('Gender:', '').strip()
+        prefix, sep, value = item.partition(':')
+        key = GARMENT_FIELDS.get(prefix) if sep else None
+        if key:
+            current_garment[key] = value.strip()
     
     # Don't forget the last garment if the list doesn't end with empty string
     if current_garment:
@@ -103,9 +106,8 @@ def format_garments_for_vector_store(structured_garments):
     """
     Format structured garments into clear, delimited text entries.
     Each garment is a complete, self-contained entry with clear boundaries.
+    Yields the entries one at a time so the corpus is never held as a list.
     """
-    formatted_entries = []
-    
     for garment in structured_garments:
         # Create a well-structured text block for each garment
         entry = f"""
@@ -123,9 +125,27 @@ Discount Percentage: {garment.get('discount_percentage', 'N/A')}
 Gender: {garment.get('gender', 'N/A')}
 === GARMENT ENTRY END ===
 """
-        formatted_entries.append(entry.strip())
-    
-    return formatted_entries
+        yield entry.strip()
+
+def hash_entries(entries):
+    """Return a SHA-256 hex digest of the entries, in order."""
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update(entry.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def load_upload_manifest(path=UPLOAD_MANIFEST_PATH):
+    """Return the digest and ids of the last upload, or {} if there is none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+def save_upload_manifest(manifest, path=UPLOAD_MANIFEST_PATH):
+    """Record the digest and ids of a finished upload."""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(manifest))
 
 # Download and process the garment data
 raw_garment_data = download_processed_garments_from_gcs()
@@ -135,22 +155,30 @@ structured_garments = parse_garments_to_structured_format(raw_garment_data)
 print(f"Parsed {len(structured_garments)} garments")
 
 # Format for vector store with clear delimiters
-formatted_garment_data = format_garments_for_vector_store(structured_garments)
+corpus_digest = hash_entries(format_garments_for_vector_store(structured_garments))
+manifest = load_upload_manifest()
 
-file_id = create_file(client, formatted_garment_data, filename="structured_garments_corpus.txt")
+if manifest.get("digest") == corpus_digest:
+    # Same corpus as the last upload: reuse its file and vector store
+    print(f"Corpus unchanged, reusing vector store {manifest['vector_store_id']}")
+else:
+    formatted_garment_data = format_garments_for_vector_store(structured_garments)
 
+    file_id = create_file(client, formatted_garment_data, filename="structured_garments_corpus.txt")
 
-vector_store = client.vector_stores.create(
-    name="structured_fashion_knowledge_base_v2",
-)
-print(vector_store.id)
+
+    vector_store = client.vector_stores.create(
+        name="structured_fashion_knowledge_base_v2",
+    )
+    print(vector_store.id)
 
 
-client.vector_stores.files.create(
-    vector_store_id=vector_store.id,
-    file_id=file_id
-)
-result = client.vector_stores.files.list(
-    vector_store_id=vector_store.id
-)
-print(result)
\ No newline at end of file
+    client.vector_stores.files.create(
+        vector_store_id=vector_store.id,
+        file_id=file_id
+    )
+    save_upload_manifest({"digest": corpus_digest, "file_id": file_id, "vector_store_id": vector_store.id})
+    result = client.vector_stores.files.list(
+        vector_store_id=vector_store.id
+    )
+    print(result)
@@ -1,10 +1,34 @@
 import os
 import asyncio
 import threading
+import sys
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, jsonify, request
-from main import main as scraper_main
+from orjson_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# One event loop for the whole process, running in a background thread, so
+# scrapes run as tasks on it instead of each building a thread and loop of its own
+_loop = asyncio.new_event_loop()
+# Bound the loop's default executor (DNS lookups etc.) for small Cloud Run instances
+_loop.set_default_executor(ThreadPoolExecutor(max_workers=4, thread_name_prefix="loop-io"))
+threading.Thread(target=_loop.run_forever, daemon=True).start()
+
+# Health check bodies never change, so serialize them once at import
+ROOT_BODY = orjson.dumps({"status": "healthy", "service": "HM Scraper", "version": "1.0"})
+HEALTH_BODY = orjson.dumps({"status": "ok"})
+
+# Guards scraping_status across the request threads and the scraper task
+_status_lock = threading.Lock()
+# Notified when a run finishes, for clients long-polling /status/wait
+_run_finished = threading.Condition(_status_lock)
+
+# Default and maximum seconds /status/wait holds a request open
+DEFAULT_WAIT_TIMEOUT = 30
+MAX_WAIT_TIMEOUT = 60
 
 # Store the status of scraping operations
 scraping_status = {
@@ -14,50 +38,69 @@ scraping_status = {
     "error": None
 }
 
-def run_scraper():
-    """Run the scraper in a separate thread"""
-    global scraping_status
+# Scraper entry point, run as its own Python process by run_scraper()
+SCRAPER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+async def relay_stderr(stream):
+    """Copy the scraper's stderr to ours as it arrives and return its last line"""
+    last_line = ""
+    async for line in stream:
+        text = line.decode("utf-8", "replace")
+        sys.stderr.write(text)
+        if text.strip():
+            last_line = text.strip()
+    return last_line
+
+async def run_scraper():
+    """Run the scraper as a task on the shared event loop"""
+    # is_running was already set by the request that started this run;
+    # the default outcome covers the task being cancelled mid-run
+    update = {"error": "Scraping was interrupted", "last_result": "Scraping failed: interrupted", "last_run": "error"}
     try:
-        scraping_status["is_running"] = True
-        scraping_status["error"] = None
-        
-        # Run the async main function
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(scraper_main())
-        
-        scraping_status["last_result"] = "Scraping completed successfully"
-        scraping_status["last_run"] = "success"
+        # Run main.py in its own process so its parsing doesn't hold the GIL against
+        # the request threads; a fresh interpreter imports only the scraper, not this server
+        process = await asyncio.create_subprocess_exec(sys.executable, SCRAPER_SCRIPT, stderr=asyncio.subprocess.PIPE)
+        try:
+            last_line = await relay_stderr(process.stderr)
+            await process.wait()
+        except asyncio.CancelledError:
+            # Don't leave the scraper running unwatched once its task is cancelled
+            if process.returncode is None:
+                process.kill()
+            raise
+        if process.returncode != 0:
+            # The last stderr line of a traceback is the exception itself
+            raise RuntimeError(last_line or f"scraper exited with code {process.returncode}")
+        update = {"error": None, "last_result": "Scraping completed successfully", "last_run": "success"}
         
     except Exception as e:
-        scraping_status["error"] = str(e)
-        scraping_status["last_result"] = f"Scraping failed: {str(e)}"
-        scraping_status["last_run"] = "error"
+        update = {"error": str(e), "last_result": f"Scraping failed: {str(e)}", "last_run": "error"}
     finally:
-        scraping_status["is_running"] = False
+        # Publish the outcome and clear is_running in one step
+        with _run_finished:
+            scraping_status.update(update, is_running=False)
+            _run_finished.notify_all()
 
 @app.route('/')
 def health_check():
     """Health check endpoint for Cloud Run"""
-    return jsonify({
-        "status": "healthy",
-        "service": "HM Scraper",
-        "version": "1.0"
-    })
+    return app.response_class(ROOT_BODY, mimetype="application/json")
 
 @app.route('/scrape', methods=['POST'])
 def trigger_scrape():
     """Endpoint to trigger the scraping process"""
-    if scraping_status["is_running"]:
-        return jsonify({
-            "status": "error",
-            "message": "Scraping is already in progress"
-        }), 409
+    # Check and claim the run under the lock so two requests can't both start one
+    with _status_lock:
+        if scraping_status["is_running"]:
+            return jsonify({
+                "status": "error",
+                "message": "Scraping is already in progress"
+            }), 409
+        scraping_status["is_running"] = True
+        scraping_status["error"] = None
     
-    # Start scraping in a background thread
-    thread = threading.Thread(target=run_scraper)
-    thread.daemon = True
-    thread.start()
+    # Start scraping on the shared event loop without waiting for it
+    asyncio.run_coroutine_threadsafe(run_scraper(), _loop)
     
     return jsonify({
         "status": "started",
@@ -67,12 +110,34 @@ def trigger_scrape():
 @app.route('/status')
 def get_status():
     """Get the current status of the scraper"""
-    return jsonify(scraping_status)
+    # Serialize a consistent snapshot rather than a dict the scraper may be updating
+    with _status_lock:
+        status = dict(scraping_status)
+    return jsonify(status)
+
+@app.route('/status/wait')
+def wait_for_status():
+    """Wait for the running scrape to finish, up to ?timeout= seconds, then return the status"""
+    try:
+        timeout = float(request.args.get('timeout', DEFAULT_WAIT_TIMEOUT))
+    except ValueError:
+        timeout = None
+    if timeout is None or not 0 <= timeout <= MAX_WAIT_TIMEOUT:
+        return jsonify({
+            "status": "error",
+            "message": f"timeout must be a number of seconds between 0 and {MAX_WAIT_TIMEOUT}"
+        }), 400
+    
+    # Returns at once when no scrape is running
+    with _run_finished:
+        _run_finished.wait_for(lambda: not scraping_status["is_running"], timeout=timeout)
+        status = dict(scraping_status)
+    return jsonify(status)
 
 @app.route('/health')
 def health():
     """Health endpoint for Cloud Run health checks"""
-    return jsonify({"status": "ok"}), 200
+    return app.response_class(HEALTH_BODY, mimetype="application/json")
 
 if __name__ == '__main__':
     # Get port from environment variable (Cloud Run sets this)